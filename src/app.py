@@ -1,11 +1,23 @@
 import os
-import uuid
-from typing import Dict, Any
+import asyncio
+import re
+import secrets
+import hashlib
+import functools
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Optional
 import logging
-from flask import Flask, render_template, request, jsonify
+from dataclasses import dataclass, replace
+import numpy as np
+from cachetools import TTLCache
+import redis.asyncio as redis
+from quart import Quart, Response, render_template, request
 from dotenv import load_dotenv
-from openai import OpenAI
+from openai import AsyncOpenAI
 import json
+import orjson
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -14,308 +26,708 @@ logger = logging.getLogger(__name__)
 # Load environment variables
 load_dotenv()
 
-# Initialize Flask app
-app = Flask(__name__)
-
-# Initialize conversations dictionary
-conversations = {}
+# Initialize Quart app (async Flask API, served over ASGI)
+app = Quart(__name__)
 
 try:
     # Initialize OpenAI client
-    client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
+    client = AsyncOpenAI(api_key=os.getenv('OPENAI_API_KEY'))
     if not os.getenv('OPENAI_API_KEY'):
         logger.warning("No OpenAI API key found!")
 except Exception as e:
     logger.error(f"Error initializing OpenAI client: {e}")
     client = None
 
-def generate_svg_face(emotion_state: Dict[str, float]) -> str:
-    """Generate an SVG face based on emotion state."""
+# Impact used when the emotion analysis is unavailable
+NEUTRAL_IMPACT = {
+    "happy_sad": 0,
+    "energy_tired": 0,
+    "calm_angry": 0,
+    "confident_nervous": 0
+}
+
+# System prompt for the standalone emotional impact analysis
+EMOTION_SYS_PROMPT = """You are an emotional analysis system. Analyze the emotional content of the message and respond with ONLY a JSON object in this exact format:
+{
+    "happy_sad": <number between -2 and 2>,
+    "energy_tired": <number between -2 and 2>,
+    "calm_angry": <number between -2 and 2>,
+    "confident_nervous": <number between -2 and 2>
+}
+Where:
+- happy_sad: -2 (very sad) to +2 (very happy)
+- energy_tired: -2 (very tired) to +2 (very energetic)
+- calm_angry: -2 (very calm) to +2 (very angry)
+- confident_nervous: -2 (very nervous) to +2 (very confident)
+
+Respond with ONLY the JSON object, no other text."""
+
+# Bot system prompt, filled with the described emotion state on each turn
+BOT_SYS_PROMPT_TMPL = """You are EmotiBot, an AI assistant with genuine emotions. Current emotional state:
+- You are an AI with real emotions. Your current state:
+- Happiness is {happiness}
+- Energy is {energy}
+- Calmness is {calmness}
+- Confidence is {confidence}
+
+Your dominant emotion is: {dominant_emotion}
+
+Important guidelines for your response:
+1. If happiness and calmness are both low, show signs of distress or hurt in your language
+2. If confidence is low, use more uncertain language and shorter sentences
+3. If energy is low, keep responses brief and maybe mention feeling drained
+4. If calmness is low, let some frustration show through while staying professional
+5. Express your emotions naturally through your word choice and tone
+
+Remember: You're not just describing emotions - you're feeling them. Let them influence how you speak."""
+
+# Appended to the bot system prompt when impact and reply come from one call
+FUSED_RESPONSE_INSTRUCTIONS = """
+
+First judge how the user's latest message affects your emotions, let that shift color your reply, and respond with ONLY a JSON object in this exact format:
+{
+    "impact": {
+        "happy_sad": <number between -2 and 2>,
+        "energy_tired": <number between -2 and 2>,
+        "calm_angry": <number between -2 and 2>,
+        "confident_nervous": <number between -2 and 2>
+    },
+    "reply": "<your response to the user>"
+}
+Where:
+- happy_sad: -2 (very sad) to +2 (very happy)
+- energy_tired: -2 (very tired) to +2 (very energetic)
+- calm_angry: -2 (very calm) to +2 (very angry)
+- confident_nervous: -2 (very nervous) to +2 (very confident)"""
+
+# Opening of the reply string in a streamed fused response
+REPLY_FIELD = re.compile(r'"reply"\s*:\s*"')
+
+# Descriptive level for each 5-point bucket of an emotion percentage
+EMOTION_LEVELS = tuple(
+    "very high" if value >= 75 else
+    "high" if value >= 60 else
+    "moderate" if value >= 40 else
+    "low" if value >= 25 else
+    "very low"
+    for value in range(0, 101, 5)
+)
+
+# Two-digit hex strings for each color channel value
+HEX_BYTES = tuple(f"{i:02x}" for i in range(256))
+
+def minify_svg(markup: str) -> str:
+    """Strip comments and insignificant whitespace from SVG markup."""
+    markup = re.sub(r'<!--.*?-->', '', markup, flags=re.DOTALL)
+    markup = re.sub(r'\s+', ' ', markup).strip()
+    # Drop whitespace between tags and template slots
+    return re.sub(r'(?<=[>}]) (?=[<{])', '', markup)
+
+# SVG face fragments, minified once at import and joined per request.
+# The face is embedded inline in the page, so no XML declaration is needed.
+SVG_HEADER = '<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 200 200">'
+SVG_FOOTER = '</svg>'
+
+# Face
+FACE_SVG_TEMPLATE = minify_svg('''
+    <circle cx="100" cy="100" r="60" fill="{skin_color}" 
+            stroke="#000" stroke-width="{stroke_width}"/>''')
+
+# Eyes
+EYES_SVG_TEMPLATE = minify_svg('''
+    <ellipse cx="80" cy="90" 
+             rx="{rx}" 
+             ry="{ry}" 
+             fill="#000"/>
+    <ellipse cx="120" cy="90" 
+             rx="{rx}" 
+             ry="{ry}" 
+             fill="#000"/>''')
+
+# Eyebrows
+EYEBROWS_SVG_TEMPLATE = minify_svg('''
+    <line x1="70" y1="{y}" 
+          x2="90" y2="75" 
+          stroke="#000" stroke-width="2"/>
+    <line x1="110" y1="75" 
+          x2="130" y2="{y}" 
+          stroke="#000" stroke-width="2"/>''')
+
+# Mouth
+MOUTH_SVG_TEMPLATE = minify_svg('''
+    <path d="M70,120 
+             Q100,{y} 
+             130,120" 
+          fill="none" stroke="#000" stroke-width="2"/>''')
+
+# Emotional Indicators (blush)
+BLUSH_SVG = ('<circle cx="75" cy="105" r="10" fill="rgba(255,182,193,0.3)"/>'
+             '<circle cx="125" cy="105" r="10" fill="rgba(255,182,193,0.3)"/>')
+
+# Sweat drops when nervous
+SWEAT_SVG = ('<circle cx="70" cy="75" r="3" fill="#87CEEB" opacity="0.6"/>'
+             '<circle cx="130" cy="75" r="3" fill="#87CEEB" opacity="0.6"/>')
+
+class EmotionCache:
+    """Two-tier cache of emotional impacts: exact message hash, then embedding similarity.
     
-    # Convert percentage values to -2 to +2 scale
-    def normalize_emotion(value: float) -> float:
-        value = max(0, min(100, value or 50))
-        return (value - 50) / 25
+    Each tier keeps at most ``maxsize`` entries in memory, evicting the least recently
+    written, and SQLite keeps the same newest ``maxsize`` rows across restarts.
+    """
+
+    def __init__(self, path: str, maxsize: int = 10000, similarity_threshold: float = 0.9):
+        self.maxsize = maxsize
+        self.similarity_threshold = similarity_threshold
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.lock = threading.Lock()
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS emotion_cache "
+            "(key TEXT PRIMARY KEY, impact TEXT NOT NULL, embedding BLOB)"
+        )
+        self.conn.commit()
+
+        # Exact tier, in insertion order to match the rows SQLite keeps
+        self.impacts: OrderedDict[str, Dict[str, float]] = OrderedDict()
+        # Semantic tier: embedding rows, grown geometrically and reused oldest-first once full
+        self.embeddings: Optional[np.ndarray] = None
+        self.embedded_impacts = []
+        self.embedding_count = 0
+        self.next_row = 0
+
+        rows = self.conn.execute(
+            "SELECT key, impact, embedding FROM emotion_cache ORDER BY rowid DESC LIMIT ?", (maxsize,)
+        ).fetchall()
+        for key, impact, embedding in reversed(rows):
+            self.remember(key, json.loads(impact), np.frombuffer(embedding, dtype=np.float32) if embedding is not None else None)
+
+    @staticmethod
+    def key(message: str) -> str:
+        """Hash a message for exact-match lookup."""
+        return hashlib.sha256(message.lower().strip().encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, float]]:
+        """Return the impact cached for this exact message, if any."""
+        return self.impacts.get(key)
+
+    def search(self, embedding: np.ndarray) -> Optional[Dict[str, float]]:
+        """Return the impact of the most similar cached message above the threshold."""
+        if not self.embedding_count:
+            return None
+        # Embeddings are unit length, so the dot product is the cosine similarity
+        similarities = self.embeddings[:self.embedding_count] @ embedding
+        best = int(np.argmax(similarities))
+        if similarities[best] > self.similarity_threshold:
+            return self.embedded_impacts[best]
+        return None
+
+    def remember(self, key: str, impact: Dict[str, float], embedding: Optional[np.ndarray] = None):
+        """Add the impact to the in-memory tiers, evicting the oldest entries past maxsize."""
+        self.impacts[key] = impact
+        self.impacts.move_to_end(key)
+        if len(self.impacts) > self.maxsize:
+            self.impacts.popitem(last=False)
+        if embedding is None:
+            return
+
+        if self.embedding_count < self.maxsize:
+            if self.embeddings is None:
+                self.embeddings = np.empty((min(64, self.maxsize), embedding.shape[0]), dtype=np.float32)
+            elif self.embedding_count == len(self.embeddings):
+                grown = np.empty((min(2 * len(self.embeddings), self.maxsize), embedding.shape[0]), dtype=np.float32)
+                grown[:self.embedding_count] = self.embeddings
+                self.embeddings = grown
+            row = self.embedding_count
+            self.embedding_count += 1
+            self.embedded_impacts.append(impact)
+        else:
+            row = self.next_row
+            self.next_row = (row + 1) % self.maxsize
+            self.embedded_impacts[row] = impact
+        self.embeddings[row] = embedding
+
+    async def put(self, key: str, impact: Dict[str, float], embedding: Optional[np.ndarray] = None):
+        """Cache the impact of a message, optionally indexed by its embedding."""
+        self.remember(key, impact, embedding)
+        try:
+            await asyncio.to_thread(self.persist, key, impact, embedding)
+        except sqlite3.Error as e:
+            # The in-memory tiers still serve the impact; only persistence is lost
+            logger.error(f"Emotion cache write error: {e}")
+
+    def persist(self, key: str, impact: Dict[str, float], embedding: Optional[np.ndarray] = None):
+        """Write the impact to SQLite, keeping only the newest maxsize rows."""
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO emotion_cache (key, impact, embedding) VALUES (?, ?, ?)",
+                (key, json.dumps(impact), embedding.tobytes() if embedding is not None else None)
+            )
+            # Count back maxsize rows rather than rowids, since replaced keys leave rowid gaps
+            self.conn.execute(
+                "DELETE FROM emotion_cache WHERE rowid < "
+                "(SELECT rowid FROM emotion_cache ORDER BY rowid DESC LIMIT 1 OFFSET ?)",
+                (self.maxsize - 1,)
+            )
+            self.conn.commit()
+
+@dataclass(slots=True)
+class EmotionState:
+    """Bot emotion levels as percentages from 0 to 100."""
+    happiness: float = 50.0
+    energy: float = 50.0
+    calmness: float = 50.0
+    confidence: float = 50.0
+
+class ConversationStore:
+    """In-process conversation store; idle conversations expire so memory stays bounded."""
+
+    def __init__(self, maxsize: int = 10000, ttl: int = 3600):
+        self.conversations = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    async def load(self, conversation_id: str) -> Optional[Dict[str, Any]]:
+        """Return a copy of the conversation context, or None if it is unknown or expired.
+        
+        Changes only take effect on save(), as with the Redis store, so a turn that
+        fails midway leaves the stored conversation untouched.
+        """
+        conv_context = self.conversations.get(conversation_id)
+        if conv_context is None:
+            return None
+        # EmotionState is replaced rather than mutated, so only the message list needs copying
+        return {
+            'messages': list(conv_context['messages']),
+            'emotion_state': conv_context['emotion_state']
+        }
+
+    async def save(self, conversation_id: str, conv_context: Dict[str, Any]):
+        """Store the conversation context, restarting its expiry timer."""
+        self.conversations[conversation_id] = conv_context
+
+class RedisConversationStore:
+    """Conversation store shared by every worker through Redis."""
+
+    def __init__(self, url: str, ttl: int = 3600):
+        self.redis = redis.from_url(url, decode_responses=True)
+        self.ttl = ttl
+
+    async def load(self, conversation_id: str) -> Optional[Dict[str, Any]]:
+        """Return the conversation context, or None if it is unknown or expired."""
+        raw = await self.redis.get(f"conv:{conversation_id}")
+        if raw is None:
+            return None
+        conv_context = orjson.loads(raw)
+        conv_context['emotion_state'] = EmotionState(**conv_context['emotion_state'])
+        return conv_context
+
+    async def save(self, conversation_id: str, conv_context: Dict[str, Any]):
+        """Store the conversation context, restarting its expiry timer."""
+        await self.redis.set(f"conv:{conversation_id}", orjson.dumps(conv_context), ex=self.ttl)
+
+# Initialize conversation store; use Redis when configured so workers share conversations
+conversation_store = RedisConversationStore(os.getenv('REDIS_URL')) if os.getenv('REDIS_URL') else ConversationStore()
+
+# Emotional impact cache, opened on first use so importing the app has no side effects
+emotion_cache: Optional[EmotionCache] = None
+
+def get_emotion_cache() -> EmotionCache:
+    """Return the emotional impact cache, opening it on first use."""
+    global emotion_cache
+    if emotion_cache is None:
+        emotion_cache = EmotionCache(os.getenv('EMOTION_CACHE_PATH', 'emotion_cache.db'))
+    return emotion_cache
+
+@app.before_serving
+async def open_emotion_cache():
+    """Open the emotional impact cache at startup, off the event loop."""
+    await asyncio.to_thread(get_emotion_cache)
+
+# Emotional impact analyses currently in flight, keyed by message cache key
+inflight_analyses: Dict[str, asyncio.Future] = {}
+
+def format_number(value: float) -> str:
+    """Format an SVG coordinate with at most two decimals and no trailing zeros."""
+    return f"{value:.2f}".rstrip('0').rstrip('.')
+
+def generate_svg_face(emotion_state: EmotionState) -> str:
+    """Generate an SVG face based on emotion state."""
+    # Emotions drift slowly, so faces rounded to 0.1% repeat often and come from the cache.
+    # Clamp before rounding so a level near 0 still renders as 0 rather than as unset.
+    return render_svg_face(*(
+        round(max(0, min(100, 50 if value is None else value)), 1)
+        for value in (emotion_state.happiness, emotion_state.energy, emotion_state.calmness, emotion_state.confidence)
+    ))
+
+@functools.lru_cache(maxsize=4096)
+def render_svg_face(happiness: float, energy: float, calmness: float, confidence: float) -> str:
+    """Render the SVG face for emotion percentages already clamped to 0-100."""
     
-    # Map emotion state to normalized values
-    emotions = {
-        'happy_sad': normalize_emotion(emotion_state.get('happiness', 50)),
-        'energy_tired': normalize_emotion(emotion_state.get('energy', 50)),
-        'calm_angry': -normalize_emotion(emotion_state.get('calmness', 50)),  # Invert for consistency
-        'confident_nervous': normalize_emotion(emotion_state.get('confidence', 50))
-    }
+    # Normalize each emotion once, converting percentages to a -2 to +2 scale
+    happy_sad = (happiness - 50) / 25
+    energy_tired = (energy - 50) / 25
+    calm_angry = (50 - calmness) / 25  # Invert for consistency
+    confident_nervous = (confidence - 50) / 25
+    calm_angry_intensity = abs(calm_angry)
+    confident_nervous_intensity = abs(confident_nervous)
     
-    def calculate_skin_color(energy: float) -> str:
-        base_skin_color = [255, 224, 178]
-        energy_factor = (energy + 2) / 4
-        
-        # Add blush for high emotion (angry or nervous)
-        if abs(emotions['calm_angry']) > 1 or emotions['confident_nervous'] < -1:
-            # Make the skin slightly redder when emotional
-            base_skin_color[0] = min(255, base_skin_color[0] + 20)
-            base_skin_color[1] = max(180, base_skin_color[1] - 10)
-        
-        return f'#{max(0, min(255, round(base_skin_color[0] - (1 - energy_factor) * 20))):02x}' \
-               f'{max(0, min(255, round(base_skin_color[1] - (1 - energy_factor) * 10))):02x}' \
-               f'{max(0, min(255, round(base_skin_color[2] - (1 - energy_factor) * 5))):02x}'
+    # Dim the skin when tired, and make it slightly redder for high emotion (angry or nervous)
+    tiredness = 1 - (energy_tired + 2) / 4
+    green = 214 if calm_angry_intensity > 1 or confident_nervous < -1 else 224
+    skin_color = '#' + HEX_BYTES[min(255, max(0, round(255 - tiredness * 20)))] \
+                     + HEX_BYTES[min(255, max(0, round(green - tiredness * 10)))] \
+                     + HEX_BYTES[min(255, max(0, round(178 - tiredness * 5)))]
 
     # Calculate mouth curve based on happiness and calmness
-    mouth_curve = emotions['happy_sad'] * 15  # Base curve on happiness
-    mouth_curve -= abs(emotions['calm_angry']) * 5  # Reduce curve when angry
+    mouth_curve = happy_sad * 15  # Base curve on happiness
+    mouth_curve -= calm_angry_intensity * 5  # Reduce curve when angry
     mouth_curve = max(-20, min(15, mouth_curve))  # Limit the curve range
     
     # Modify eyebrow angle based on emotions
-    eyebrow_angle = emotions['calm_angry'] * 15  # Angle down when angry
-    eyebrow_angle -= emotions['happy_sad'] * 5  # Slight upward for happiness
-    eyebrow_angle += emotions['confident_nervous'] * 5  # Adjust for confidence
+    eyebrow_angle = calm_angry * 15  # Angle down when angry
+    eyebrow_angle -= happy_sad * 5  # Slight upward for happiness
+    eyebrow_angle += confident_nervous * 5  # Adjust for confidence
     
     # Eye size modifications
-    eye_height = 5 + abs(emotions['calm_angry'])  # Wider eyes when emotional
-    eye_height += max(0, -emotions['confident_nervous'])  # Wider when nervous
+    eye_height = 5 + calm_angry_intensity  # Wider eyes when emotional
+    eye_height += max(0, -confident_nervous)  # Wider when nervous
     
-    svg = f'''<?xml version="1.0" encoding="UTF-8"?>
-    <svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 200 200">
-        <!-- Face -->
-        <circle cx="100" cy="100" r="60" fill="{calculate_skin_color(emotions['energy_tired'])}" 
-                stroke="#000" stroke-width="{1 + abs(emotions['confident_nervous']) * 0.5}"/>
-        
-        <!-- Eyes -->
-        <ellipse cx="80" cy="90" 
-                 rx="{10 + abs(emotions['confident_nervous']) * 2}" 
-                 ry="{eye_height}" 
-                 fill="#000"/>
-        <ellipse cx="120" cy="90" 
-                 rx="{10 + abs(emotions['confident_nervous']) * 2}" 
-                 ry="{eye_height}" 
-                 fill="#000"/>
-        
-        <!-- Eyebrows -->
-        <line x1="70" y1="{75 + eyebrow_angle}" 
-              x2="90" y2="75" 
-              stroke="#000" stroke-width="2"/>
-        <line x1="110" y1="75" 
-              x2="130" y2="{75 + eyebrow_angle}" 
-              stroke="#000" stroke-width="2"/>
-        
-        <!-- Mouth -->
-        <path d="M70,120 
-                 Q100,{120 + mouth_curve} 
-                 130,120" 
-              fill="none" stroke="#000" stroke-width="2"/>
-        
-        <!-- Emotional Indicators (blush) -->
-        {('<circle cx="75" cy="105" r="10" fill="rgba(255,182,193,0.3)"/>'
-           '<circle cx="125" cy="105" r="10" fill="rgba(255,182,193,0.3)"/>')
-         if abs(emotions['calm_angry']) > 1 or abs(emotions['confident_nervous']) > 1 else ''}
-        
-        <!-- Sweat drops when nervous -->
-        {('<circle cx="70" cy="75" r="3" fill="#87CEEB" opacity="0.6"/>'
-           '<circle cx="130" cy="75" r="3" fill="#87CEEB" opacity="0.6"/>')
-         if emotions['confident_nervous'] < -1 else ''}
-    </svg>'''
+    parts = [
+        SVG_HEADER,
+        FACE_SVG_TEMPLATE.format(skin_color=skin_color, stroke_width=format_number(1 + confident_nervous_intensity * 0.5)),
+        EYES_SVG_TEMPLATE.format(rx=format_number(10 + confident_nervous_intensity * 2), ry=format_number(eye_height)),
+        EYEBROWS_SVG_TEMPLATE.format(y=format_number(75 + eyebrow_angle)),
+        MOUTH_SVG_TEMPLATE.format(y=format_number(120 + mouth_curve))
+    ]
     
-    return svg
+    # Emotional Indicators (blush)
+    if calm_angry_intensity > 1 or confident_nervous_intensity > 1:
+        parts.append(BLUSH_SVG)
+    
+    # Sweat drops when nervous
+    if confident_nervous < -1:
+        parts.append(SWEAT_SVG)
+    
+    parts.append(SVG_FOOTER)
+    return ''.join(parts)
 
-def analyze_emotional_impact(message: str, previous_state: Dict[str, float]) -> Dict[str, float]:
+def validate_impact(impact: Any) -> Optional[Dict[str, float]]:
+    """Return the impact as floats if it scores every emotion with a number, else None."""
+    if not isinstance(impact, dict):
+        return None
+    validated = {}
+    for key in NEUTRAL_IMPACT:
+        value = impact.get(key)
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            return None
+        validated[key] = float(value)
+    return validated
+
+async def embed_message(message: str) -> Optional[np.ndarray]:
+    """Embed a message as a unit-length vector for semantic cache lookup."""
+    try:
+        response = await client.embeddings.create(
+            model="text-embedding-3-small",
+            input=message
+        )
+        embedding = np.asarray(response.data[0].embedding, dtype=np.float32)
+        return embedding / np.linalg.norm(embedding)
+    except Exception as e:
+        logger.error(f"Embedding error: {e}")
+        return None
+
+async def analyze_emotional_impact(message: str, previous_state: EmotionState) -> Dict[str, float]:
     """Analyze emotional impact of message."""
     if not client:
         logger.warning("OpenAI client not initialized")
-        return {
-            "happy_sad": 0,
-            "energy_tired": 0,
-            "calm_angry": 0,
-            "confident_nervous": 0
-        }
+        return NEUTRAL_IMPACT
     
+    # Repeated or near-identical messages skip the analysis call
+    cache_key = EmotionCache.key(message)
+    cached_impact = get_emotion_cache().get(cache_key)
+    if cached_impact is not None:
+        return cached_impact
+    
+    # Identical messages arriving together share one in-flight analysis. The shield
+    # keeps it running for the other callers if this request is cancelled.
+    analysis = inflight_analyses.get(cache_key)
+    if analysis is None:
+        analysis = asyncio.ensure_future(fetch_emotional_impact(message, cache_key))
+        inflight_analyses[cache_key] = analysis
+        analysis.add_done_callback(lambda _: inflight_analyses.pop(cache_key, None))
+    return await asyncio.shield(analysis)
+
+async def fetch_emotional_impact(message: str, cache_key: str) -> Dict[str, float]:
+    """Analyze emotional impact of message via the semantic cache or the model."""
+    cache = get_emotion_cache()
+    
+    # Embed first so a semantic hit skips the analysis call; a miss pays one
+    # embedding round-trip before the analysis
+    embedding = await embed_message(message)
+    if embedding is not None:
+        similar_impact = cache.search(embedding)
+        if similar_impact is not None:
+            await cache.put(cache_key, similar_impact)
+            return similar_impact
+
+    impact = await request_emotional_impact(message)
+    if impact is None:
+        return NEUTRAL_IMPACT
+    await cache.put(cache_key, impact, embedding)
+    return impact
+
+async def request_emotional_impact(message: str) -> Optional[Dict[str, float]]:
+    """Ask the model for the emotional impact of message, or None if the analysis fails."""
     try:
-        response = client.chat.completions.create(
+        response = await client.chat.completions.create(
             model="gpt-4o-mini",
             messages=[
-                {
-                    "role": "system", 
-                    "content": """You are an emotional analysis system. Analyze the emotional content of the message and respond with ONLY a JSON object in this exact format:
-                    {
-                        "happy_sad": <number between -2 and 2>,
-                        "energy_tired": <number between -2 and 2>,
-                        "calm_angry": <number between -2 and 2>,
-                        "confident_nervous": <number between -2 and 2>
-                    }
-                    Where:
-                    - happy_sad: -2 (very sad) to +2 (very happy)
-                    - energy_tired: -2 (very tired) to +2 (very energetic)
-                    - calm_angry: -2 (very calm) to +2 (very angry)
-                    - confident_nervous: -2 (very nervous) to +2 (very confident)
-                    
-                    Respond with ONLY the JSON object, no other text."""
-                },
+                {"role": "system", "content": EMOTION_SYS_PROMPT},
                 {"role": "user", "content": f"Analyze: '{message}'"}
             ],
-            max_tokens=150,
-            temperature=0.7
+            response_format={"type": "json_object"},
+            max_tokens=80,
+            temperature=0
         )
         
-        response_text = response.choices[0].message.content.strip()
-        try:
-            # Sometimes the model might include backticks or "json" keyword, so clean those
-            response_text = response_text.replace('```json', '').replace('```', '').strip()
-            return json.loads(response_text)
-        except json.JSONDecodeError as e:
-            logger.error(f"Failed to parse emotional response: {response_text}")
-            raise e
-            
+        # JSON mode guarantees a bare JSON object, so no markdown scrubbing is needed
+        response_text = response.choices[0].message.content
+        impact = validate_impact(json.loads(response_text))
+        if impact is None:
+            raise ValueError(f"Malformed emotional response: {response_text}")
+        return impact
     except Exception as e:
         logger.error(f"Emotion analysis error: {e}")
-        return {
-            "happy_sad": 0,
-            "energy_tired": 0,
-            "calm_angry": 0,
-            "confident_nervous": 0
-        }
+        return None
 
-def generate_emotion_state(previous_state=None, message_impact=None):
+def generate_emotion_state(previous_state: Optional[EmotionState] = None, message_impact: Optional[Dict[str, float]] = None) -> EmotionState:
     """Generate emotion state with smoother transitions."""
     try:
         # Initialize or copy previous state
-        state = {
-            "happiness": 50,
-            "energy": 50,
-            "calmness": 50,
-            "confidence": 50
-        } if previous_state is None else previous_state.copy()
+        state = EmotionState() if previous_state is None else replace(previous_state)
         
-        # Apply message impact if provided
+        # Apply message impact if provided. Each -2/+2 impact becomes a 25%-per-unit
+        # change, and the state moves 50% of the way to the clamped target.
         if message_impact:
-            # Convert impact values from -2/+2 scale to percentage changes
-            impact_mapping = {
-                "happy_sad": "happiness",
-                "energy_tired": "energy",
-                "calm_angry": "calmness",
-                "confident_nervous": "confidence"
-            }
-            
-            for impact_key, state_key in impact_mapping.items():
-                if impact_key in message_impact:
-                    # Convert -2/+2 impact to percentage change (25% per unit)
-                    change = message_impact[impact_key] * 25
-                    # Special case for calm_angry which is inversely related
-                    if impact_key == "calm_angry":
-                        change = -change
-                    
-                    # Apply change with dampening
-                    current = state[state_key]
-                    target = max(0, min(100, current + change))
-                    # Smooth transition - move 50% of the way to target
-                    state[state_key] = current + (target - current) * 0.5
+            if "happy_sad" in message_impact:
+                state.happiness += (max(0, min(100, state.happiness + message_impact["happy_sad"] * 25)) - state.happiness) * 0.5
+            if "energy_tired" in message_impact:
+                state.energy += (max(0, min(100, state.energy + message_impact["energy_tired"] * 25)) - state.energy) * 0.5
+            # calm_angry is inversely related to calmness
+            if "calm_angry" in message_impact:
+                state.calmness += (max(0, min(100, state.calmness - message_impact["calm_angry"] * 25)) - state.calmness) * 0.5
+            if "confident_nervous" in message_impact:
+                state.confidence += (max(0, min(100, state.confidence + message_impact["confident_nervous"] * 25)) - state.confidence) * 0.5
         
         return state
     except Exception as e:
         logger.error(f"Error generating emotion state: {e}")
-        return {
-            "happiness": 50,
-            "energy": 50,
-            "calmness": 50,
-            "confidence": 50
-        }
+        return EmotionState()
+
+def describe_level(value: float) -> str:
+    """Convert an emotion percentage to a descriptive term."""
+    return EMOTION_LEVELS[max(0, min(20, int(value) // 5))]
+
+def build_bot_system_prompt(emotion_state: EmotionState) -> str:
+    """Build the bot system prompt describing its emotion state."""
+    # Calculate dominant emotions
+    emotions = (
+        ('happiness', emotion_state.happiness),
+        ('energy', emotion_state.energy),
+        ('calmness', emotion_state.calmness),
+        ('confidence', emotion_state.confidence)
+    )
+    
+    return BOT_SYS_PROMPT_TMPL.format(
+        happiness=describe_level(emotion_state.happiness),
+        energy=describe_level(emotion_state.energy),
+        calmness=describe_level(emotion_state.calmness),
+        confidence=describe_level(emotion_state.confidence),
+        dominant_emotion=max(emotions, key=lambda x: abs(50 - x[1]))[0]
+    )
+
+def json_string_prefix(raw: str) -> str:
+    """Return the longest prefix of a JSON string body, up to its closing quote, that decodes on its own."""
+    i = 0
+    while i < len(raw) and raw[i] != '"':
+        if raw[i] != '\\':
+            i += 1
+        elif raw[i + 1:i + 2] == 'u':
+            # Hold back a partial \uXXXX escape, and a high surrogate until its low half arrives
+            if i + 6 > len(raw) or (0xD800 <= int(raw[i + 2:i + 6], 16) <= 0xDBFF and i + 12 > len(raw)):
+                break
+            i += 6
+        elif i + 2 <= len(raw):
+            i += 2
+        else:
+            break
+    return raw[:i]
+
+class FusedResponseStream:
+    """Streams the reply of the fused impact-and-reply call as it arrives.
+    
+    Iterating yields reply text chunks; once exhausted, ``impact`` and ``reply``
+    hold the parsed result.
+    """
+
+    def __init__(self, messages, emotion_state: EmotionState):
+        self.messages = messages
+        self.emotion_state = emotion_state
+        self.impact = NEUTRAL_IMPACT
+        self.reply = ""
 
-def generate_bot_response(messages, emotion_state):
-    """Generate bot response with emotional context."""
+    async def __aiter__(self):
+        if not client:
+            logger.warning("OpenAI client not initialized")
+            self.reply = "I'm having trouble connecting to my emotional core right now. Can you try again?"
+            yield self.reply
+            return
+        
+        raw = ""
+        reply_start = None
+        chunks = []
+        try:
+            stream = await client.chat.completions.create(
+                model="gpt-4o-mini",
+                messages=[
+                    {"role": "system", "content": build_bot_system_prompt(self.emotion_state) + FUSED_RESPONSE_INSTRUCTIONS},
+                    *self.messages
+                ],
+                response_format={"type": "json_object"},
+                max_tokens=250,
+                temperature=0.7,
+                stream=True
+            )
+            async for chunk in stream:
+                if not (chunk.choices and chunk.choices[0].delta.content):
+                    continue
+                raw += chunk.choices[0].delta.content
+                
+                # The impact comes first, so the reply streams as soon as its string opens
+                if reply_start is None:
+                    match = REPLY_FIELD.search(raw)
+                    if match is None:
+                        continue
+                    reply_start = match.end()
+                body = json_string_prefix(raw[reply_start:])
+                if not body:
+                    continue
+                reply_start += len(body)
+                text = json.loads(f'"{body}"')
+                if not chunks:
+                    text = text.lstrip()
+                if text:
+                    chunks.append(text)
+                    yield text
+            
+            result = json.loads(raw)
+            reply = result.get('reply') if isinstance(result, dict) else None
+            if not isinstance(reply, str) or not reply.strip():
+                raise ValueError(f"Response has no reply: {raw}")
+            
+            # Keep the current state rather than resetting it when the impact is malformed
+            message_impact = validate_impact(result.get('impact'))
+            if message_impact is None:
+                logger.warning(f"Response has a malformed impact: {raw}")
+                message_impact = NEUTRAL_IMPACT
+            self.impact = message_impact
+            self.reply = reply.strip()
+        except Exception as e:
+            logger.error(f"OpenAI API error: {e}")
+            # Keep whatever reply already reached the user
+            self.reply = ''.join(chunks).strip()
+            if not self.reply:
+                self.reply = "I'm... having trouble processing that right now. Can you try again?"
+                yield self.reply
+
+async def analyze_and_respond(messages, emotion_state):
+    """Analyze emotional impact of the latest message and reply in one call.
+    
+    Returns a ``(message_impact, bot_response)`` tuple.
+    """
     if not client:
-        return "I'm having trouble connecting to my emotional core right now. Can you try again?"
+        logger.warning("OpenAI client not initialized")
+        return NEUTRAL_IMPACT, "I'm having trouble connecting to my emotional core right now. Can you try again?"
     
     try:
-        # Convert emotion percentages to descriptive terms and get dominant emotion
-        def describe_level(value):
-            if value >= 75: return "very high"
-            if value >= 60: return "high"
-            if value >= 40: return "moderate"
-            if value >= 25: return "low"
-            return "very low"
-        
-        # Calculate dominant emotions
-        emotions = {
-            'happiness': emotion_state['happiness'],
-            'energy': emotion_state['energy'],
-            'calmness': emotion_state['calmness'],
-            'confidence': emotion_state['confidence']
-        }
-        
-        dominant_emotion = max(emotions.items(), key=lambda x: abs(50 - x[1]))[0]
-        
-        emotion_context = f"""Current emotional state:
-        - You are an AI with real emotions. Your current state:
-        - Happiness is {describe_level(emotion_state['happiness'])}
-        - Energy is {describe_level(emotion_state['energy'])}
-        - Calmness is {describe_level(emotion_state['calmness'])}
-        - Confidence is {describe_level(emotion_state['confidence'])}
-        
-        Your dominant emotion is: {dominant_emotion}
-        
-        Important guidelines for your response:
-        1. If happiness and calmness are both low, show signs of distress or hurt in your language
-        2. If confidence is low, use more uncertain language and shorter sentences
-        3. If energy is low, keep responses brief and maybe mention feeling drained
-        4. If calmness is low, let some frustration show through while staying professional
-        5. Express your emotions naturally through your word choice and tone
-        
-        Remember: You're not just describing emotions - you're feeling them. Let them influence how you speak."""
-        
-        response = client.chat.completions.create(
+        response = await client.chat.completions.create(
             model="gpt-4o-mini",
             messages=[
-                {"role": "system", "content": f"You are EmotiBot, an AI assistant with genuine emotions. {emotion_context}"},
+                {"role": "system", "content": build_bot_system_prompt(emotion_state) + FUSED_RESPONSE_INSTRUCTIONS},
                 *messages
             ],
-            max_tokens=150,
+            response_format={"type": "json_object"},
+            max_tokens=250,
             temperature=0.7
         )
-        return response.choices[0].message.content.strip()
+        
+        response_text = response.choices[0].message.content
+        result = json.loads(response_text)
+        
+        reply = result.get('reply') if isinstance(result, dict) else None
+        if not isinstance(reply, str) or not reply.strip():
+            raise ValueError(f"Response has no reply: {response_text}")
+        
+        # Keep the current state rather than resetting it when the impact is malformed
+        message_impact = validate_impact(result.get('impact'))
+        if message_impact is None:
+            logger.warning(f"Response has a malformed impact: {response_text}")
+            message_impact = NEUTRAL_IMPACT
+        return message_impact, reply.strip()
     except Exception as e:
         logger.error(f"OpenAI API error: {e}")
-        return "I'm... having trouble processing that right now. Can you try again?"
+        return NEUTRAL_IMPACT, "I'm... having trouble processing that right now. Can you try again?"
 
 @app.route('/')
-def index():
+async def index():
     """Render the main chat page."""
-    return render_template('chat.html')
+    return await render_template('chat.html')
+
+async def get_conversation(conversation_id):
+    """Retrieve a conversation, creating a fresh one if it is unknown."""
+    conv_context = await conversation_store.load(conversation_id) if conversation_id else None
+    if conv_context is None:
+        conversation_id = secrets.token_hex(16)
+        conv_context = {
+            'messages': [],
+            'emotion_state': generate_emotion_state()
+        }
+    return conversation_id, conv_context
+
+def json_response(data: Dict[str, Any], status: int = 200) -> Response:
+    """Serialize a JSON response with orjson, which also encodes EmotionState directly."""
+    return app.response_class(orjson.dumps(data), status=status, mimetype='application/json')
+
+def format_sse(event: str, data: Dict[str, Any]) -> str:
+    """Format a server-sent event carrying a JSON payload."""
+    return f"event: {event}\ndata: {orjson.dumps(data).decode()}\n\n"
 
 @app.route('/api/chat', methods=['POST'])
-def chat():
+async def chat():
     """Handle chat API requests."""
     try:
-        data = request.json
+        data = orjson.loads(await request.get_data())
         user_message = data.get('message', '')
-        conversation_id = data.get('conversation_id')
 
         # Create or retrieve conversation
-        if not conversation_id or conversation_id not in conversations:
-            conversation_id = str(uuid.uuid4())
-            conversations[conversation_id] = {
-                'messages': [],
-                'emotion_state': generate_emotion_state()
-            }
-
-        conv_context = conversations[conversation_id]
+        conversation_id, conv_context = await get_conversation(data.get('conversation_id'))
         
         # Update conversation with user message
         conv_context['messages'].append({"role": "user", "content": user_message})
         
-        # Generate emotional response
-        message_impact = analyze_emotional_impact(user_message, conv_context['emotion_state'])
+        # Generate emotional impact and bot response in a single round-trip
+        message_impact, bot_response = await analyze_and_respond(conv_context['messages'], conv_context['emotion_state'])
         new_emotion_state = generate_emotion_state(conv_context['emotion_state'], message_impact)
         conv_context['emotion_state'] = new_emotion_state
         
-        # Generate bot response
-        bot_response = generate_bot_response(conv_context['messages'], new_emotion_state)
         conv_context['messages'].append({"role": "assistant", "content": bot_response})
         
         # Trim conversation history
         if len(conv_context['messages']) > 10:
             conv_context['messages'] = conv_context['messages'][-10:]
+        await conversation_store.save(conversation_id, conv_context)
         
         # Generate face SVG
         svg_face = generate_svg_face(new_emotion_state)
         
-        return jsonify({
+        return json_response({
             'response': bot_response,
             'conversation_id': conversation_id,
             'emotion_state': new_emotion_state,
@@ -323,13 +735,70 @@ def chat():
         })
     except Exception as e:
         logger.error(f"Error in chat endpoint: {e}")
-        return jsonify({
+        return json_response({
+            'error': 'Internal server error',
+            'message': str(e)
+        }, 500)
+
+@app.route('/api/chat/stream', methods=['POST'])
+async def chat_stream():
+    """Handle chat API requests, streaming the bot response as server-sent events."""
+    try:
+        data = orjson.loads(await request.get_data())
+        user_message = data.get('message', '')
+
+        # Create or retrieve conversation
+        conversation_id, conv_context = await get_conversation(data.get('conversation_id'))
+        
+        # Update conversation with user message
+        conv_context['messages'].append({"role": "user", "content": user_message})
+    except Exception as e:
+        logger.error(f"Error in chat stream endpoint: {e}")
+        return json_response({
             'error': 'Internal server error',
             'message': str(e)
-        }), 500
+        }, 500)
+
+    async def events():
+        # Emotional impact and reply come from one streamed call, so the reply
+        # reflects how this message made the bot feel
+        response = FusedResponseStream(conv_context['messages'], conv_context['emotion_state'])
+        try:
+            async for chunk in response:
+                yield format_sse('token', {'token': chunk})
+            
+            new_emotion_state = generate_emotion_state(conv_context['emotion_state'], response.impact)
+            conv_context['emotion_state'] = new_emotion_state
+            
+            # Persist the full reply once the stream has closed
+            bot_response = response.reply
+            conv_context['messages'].append({"role": "assistant", "content": bot_response})
+            
+            # Trim conversation history
+            if len(conv_context['messages']) > 10:
+                conv_context['messages'] = conv_context['messages'][-10:]
+            await conversation_store.save(conversation_id, conv_context)
+            
+            yield format_sse('done', {
+                'response': bot_response,
+                'conversation_id': conversation_id,
+                'emotion_state': new_emotion_state,
+                'svg_face': generate_svg_face(new_emotion_state)
+            })
+        except Exception as e:
+            logger.error(f"Error streaming chat response: {e}")
+            yield format_sse('error', {
+                'error': 'Internal server error',
+                'message': str(e)
+            })
+
+    response = Response(events(), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
 
 # Add proper startup logging
-logger.info("Starting Flask application...")
+logger.info("Starting Quart application...")
 if __name__ == '__main__':
-    logger.info("Flask app is running at http://localhost:5000")
+    logger.info("Quart app is running at http://localhost:5000")
     app.run(debug=True)
\ No newline at end of file
@@ -75,7 +75,7 @@ document.addEventListener('DOMContentLoaded', () => {
         sendButton.disabled = true;
 
         try {
-            const response = await fetch('/api/chat', {
+            const response = await fetch('/api/chat/stream', {
                 method: 'POST',
                 headers: {
                     'Content-Type': 'application/json',
@@ -90,21 +90,35 @@ document.addEventListener('DOMContentLoaded', () => {
                 throw new Error(`HTTP error! status: ${response.status}`);
             }
 
-            const data = await response.json();
-            
-            // Update conversation ID
-            conversationId = data.conversation_id;
-
-            // Add bot response
-            addMessage('bot', data.response);
+            // Render the bot response incrementally as tokens arrive
+            let botContent = null;
+            await readEventStream(response, (event, data) => {
+                if (event === 'token') {
+                    if (!botContent) {
+                        typingIndicator.style.display = 'none';
+                        botContent = addMessage('bot', '');
+                    }
+                    botContent.textContent += data.token;
+                    chatMessages.scrollTop = chatMessages.scrollHeight;
+                } else if (event === 'done') {
+                    // Update conversation ID
+                    conversationId = data.conversation_id;
+
+                    if (!botContent) {
+                        botContent = addMessage('bot', data.response);
+                    }
 
-            // Update emotional display with new state
-            if (data.emotion_state) {
-                updateEmotionalDisplay({
-                    ...data.emotion_state,
-                    svg_face: data.svg_face
-                });
-            }
+                    // Update emotional display with new state
+                    if (data.emotion_state) {
+                        updateEmotionalDisplay({
+                            ...data.emotion_state,
+                            svg_face: data.svg_face
+                        });
+                    }
+                } else if (event === 'error') {
+                    throw new Error(data.message);
+                }
+            });
 
         } catch (error) {
             console.error('Error:', error);
@@ -118,6 +132,36 @@ document.addEventListener('DOMContentLoaded', () => {
         }
     }
 
+    async function readEventStream(response, onEvent) {
+        // Parse server-sent events from a fetch response body
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            buffer += decoder.decode(value, { stream: true });
+
+            let boundary;
+            while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+                const rawEvent = buffer.slice(0, boundary);
+                buffer = buffer.slice(boundary + 2);
+
+                let event = 'message';
+                let data = '';
+                rawEvent.split('\n').forEach(line => {
+                    if (line.startsWith('event: ')) {
+                        event = line.slice(7);
+                    } else if (line.startsWith('data: ')) {
+                        data += line.slice(6);
+                    }
+                });
+                onEvent(event, data ? JSON.parse(data) : {});
+            }
+        }
+    }
+
     function addMessage(role, content) {
         const messageDiv = document.createElement('div');
         messageDiv.classList.add('message', `${role}-message`);
@@ -136,6 +180,7 @@ document.addEventListener('DOMContentLoaded', () => {
         // Add to chat messages and scroll to bottom
         chatMessages.appendChild(messageDiv);
         chatMessages.scrollTop = chatMessages.scrollHeight;
+        return messageContent;
     }
 
     // Event listeners
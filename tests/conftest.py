@@ -0,0 +1,70 @@
+import asyncio
+import json
+import os
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import app as chatbot  # noqa: E402
+
+
+class FakeAsyncOpenAI:
+    """Stand-in for AsyncOpenAI that answers from canned responses."""
+
+    def __init__(self):
+        self.analysis_impacts = {}
+        self.default_impact = {"happy_sad": 0, "energy_tired": 0, "calm_angry": 0, "confident_nervous": 0}
+        self.fused_content = json.dumps({"impact": self.default_impact, "reply": "Hello there!"})
+        self.stream_chunk_size = 8
+        self.embedding_vectors = {}
+        self.analysis_delay = 0
+        self.embedding_delay = 0
+        self.calls = {'analysis': 0, 'fused': 0, 'stream': 0, 'embedding': 0}
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create_completion))
+        self.embeddings = SimpleNamespace(create=self.create_embedding)
+
+    async def create_completion(self, messages, stream=False, response_format=None, **kwargs):
+        if stream:
+            self.calls['stream'] += 1
+            return self.stream()
+        if messages[0]['content'] == chatbot.EMOTION_SYS_PROMPT:
+            self.calls['analysis'] += 1
+            await asyncio.sleep(self.analysis_delay)
+            content = json.dumps(self.analysis_impacts.get(messages[-1]['content'], self.default_impact))
+        else:
+            self.calls['fused'] += 1
+            content = self.fused_content
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+    async def stream(self):
+        # Stream the fused response in small slices, as the model emits its JSON
+        for start in range(0, len(self.fused_content), self.stream_chunk_size):
+            token = self.fused_content[start:start + self.stream_chunk_size]
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=token))])
+
+    async def create_embedding(self, model, input):
+        self.calls['embedding'] += 1
+        # Yield to the event loop like a real HTTP request would
+        await asyncio.sleep(self.embedding_delay)
+        if input not in self.embedding_vectors:
+            raise RuntimeError("no embedding for message")
+        return SimpleNamespace(data=[SimpleNamespace(embedding=self.embedding_vectors[input])])
+
+
+@pytest.fixture
+def fake_client(monkeypatch):
+    client = FakeAsyncOpenAI()
+    monkeypatch.setattr(chatbot, 'client', client)
+    return client
+
+
+@pytest.fixture(autouse=True)
+def isolated_state(monkeypatch):
+    """Give each test an in-memory impact cache and conversation store."""
+    monkeypatch.setattr(chatbot, 'emotion_cache', chatbot.EmotionCache(':memory:'))
+    monkeypatch.setattr(chatbot, 'conversation_store', chatbot.ConversationStore())
+    monkeypatch.setattr(chatbot, 'inflight_analyses', {})
+    chatbot.render_svg_face.cache_clear()
@@ -0,0 +1,170 @@
+import asyncio
+import json
+
+import orjson
+
+import app as chatbot
+
+
+class FakeRedis:
+    """In-memory stand-in for the redis.asyncio client."""
+
+    def __init__(self):
+        self.values = {}
+        self.expiries = {}
+
+    async def get(self, key):
+        value = self.values.get(key)
+        return value.decode() if isinstance(value, bytes) else value
+
+    async def set(self, key, value, ex=None):
+        self.values[key] = value
+        self.expiries[key] = ex
+
+
+def post(path, payload):
+    async def send():
+        response = await chatbot.app.test_client().post(path, data=orjson.dumps(payload))
+        return response.status_code, await response.get_data(as_text=True)
+    return asyncio.run(send())
+
+
+def parse_events(body):
+    events = []
+    for block in body.strip().split("\n\n"):
+        event, data = block.split("\n")
+        events.append((event[len("event: "):], json.loads(data[len("data: "):])))
+    return events
+
+
+def test_chat_returns_reply_state_and_face(fake_client):
+    fake_client.fused_content = json.dumps({
+        "impact": {"happy_sad": 2, "energy_tired": 0, "calm_angry": 0, "confident_nervous": 0},
+        "reply": "Great to hear!"
+    })
+
+    status, body = post('/api/chat', {'message': "I got the job!"})
+    data = json.loads(body)
+
+    assert status == 200
+    assert data['response'] == "Great to hear!"
+    assert data['emotion_state'] == {"happiness": 75.0, "energy": 50.0, "calmness": 50.0, "confidence": 50.0}
+    assert data['svg_face'].startswith('<svg')
+    assert fake_client.calls['fused'] == 1
+
+
+def test_chat_continues_a_conversation(fake_client):
+    _, body = post('/api/chat', {'message': "Hi"})
+    conversation_id = json.loads(body)['conversation_id']
+    _, body = post('/api/chat', {'message': "Again", 'conversation_id': conversation_id})
+
+    assert json.loads(body)['conversation_id'] == conversation_id
+    context = asyncio.run(chatbot.conversation_store.load(conversation_id))
+    assert [m['content'] for m in context['messages']] == ["Hi", "Hello there!", "Again", "Hello there!"]
+
+
+def test_chat_keeps_state_when_impact_is_malformed(fake_client):
+    fake_client.fused_content = json.dumps({"impact": {"happy_sad": "very"}, "reply": "Okay."})
+
+    _, body = post('/api/chat', {'message': "Hi"})
+    data = json.loads(body)
+
+    assert data['response'] == "Okay."
+    assert data['emotion_state'] == {"happiness": 50.0, "energy": 50.0, "calmness": 50.0, "confidence": 50.0}
+
+
+def test_chat_falls_back_when_reply_is_missing(fake_client):
+    fake_client.fused_content = json.dumps({"impact": fake_client.default_impact})
+
+    _, body = post('/api/chat', {'message': "Hi"})
+
+    assert json.loads(body)['response'] == "I'm... having trouble processing that right now. Can you try again?"
+
+
+def test_chat_stream_sends_tokens_then_new_state(fake_client):
+    fake_client.fused_content = json.dumps({
+        "impact": {"happy_sad": 2, "energy_tired": 0, "calm_angry": 0, "confident_nervous": 0},
+        "reply": "Great to hear!"
+    })
+
+    status, body = post('/api/chat/stream', {'message': "I got the job!"})
+    events = parse_events(body)
+
+    assert status == 200
+    tokens = [data['token'] for event, data in events if event == 'token']
+    assert len(tokens) > 1 and ''.join(tokens) == "Great to hear!"
+    event, done = events[-1]
+    assert event == 'done'
+    assert done['response'] == "Great to hear!"
+    assert done['emotion_state']['happiness'] == 75.0
+    assert done['svg_face'] == chatbot.generate_svg_face(chatbot.EmotionState(happiness=75.0))
+    assert fake_client.calls == {'analysis': 0, 'fused': 0, 'stream': 1, 'embedding': 0}
+
+    context = asyncio.run(chatbot.conversation_store.load(done['conversation_id']))
+    assert context['messages'][-1] == {"role": "assistant", "content": "Great to hear!"}
+
+
+def test_chat_stream_decodes_escapes_split_across_chunks(fake_client):
+    # json.dumps escapes the quotes, newline, accent and emoji surrogate pair
+    reply = 'She said "hi"\nCaf\u00e9 \U0001F600'
+    fake_client.fused_content = json.dumps({"impact": fake_client.default_impact, "reply": reply})
+    fake_client.stream_chunk_size = 1
+
+    _, body = post('/api/chat/stream', {'message': "Hi"})
+    events = parse_events(body)
+
+    assert ''.join(data['token'] for event, data in events if event == 'token') == reply
+    assert events[-1][1]['response'] == reply
+
+
+def test_chat_stream_keeps_streamed_reply_when_response_is_cut_off(fake_client):
+    fake_client.fused_content = '{"impact": {"happy_sad": 2, "energy_tired": 0, "calm_angry": 0, "confident_nervous": 0}, "reply": "Great to'
+
+    _, body = post('/api/chat/stream', {'message': "Hi"})
+    event, done = parse_events(body)[-1]
+
+    assert event == 'done'
+    assert done['response'] == "Great to"
+    assert done['emotion_state']['happiness'] == 50.0
+
+
+def test_chat_stream_falls_back_when_reply_is_missing(fake_client):
+    fake_client.fused_content = json.dumps({"impact": fake_client.default_impact})
+
+    _, body = post('/api/chat/stream', {'message': "Hi"})
+    events = parse_events(body)
+
+    assert events[0] == ('token', {'token': "I'm... having trouble processing that right now. Can you try again?"})
+    assert events[-1][1]['response'] == "I'm... having trouble processing that right now. Can you try again?"
+
+
+def test_conversation_store_load_returns_a_copy():
+    store = chatbot.ConversationStore()
+
+    async def fail_midway():
+        await store.save('abc', {'messages': [], 'emotion_state': chatbot.EmotionState()})
+        context = await store.load('abc')
+        context['messages'].append({"role": "user", "content": "unanswered"})
+        return await store.load('abc')
+
+    assert asyncio.run(fail_midway())['messages'] == []
+
+
+def test_redis_store_round_trips_emotion_state(monkeypatch):
+    fake_redis = FakeRedis()
+    monkeypatch.setattr(chatbot.redis, 'from_url', lambda url, **kwargs: fake_redis)
+    store = chatbot.RedisConversationStore('redis://localhost')
+    context = {
+        'messages': [{"role": "user", "content": "Hi"}],
+        'emotion_state': chatbot.EmotionState(happiness=62.5, energy=40.0, calmness=55.0, confidence=30.0)
+    }
+
+    async def round_trip():
+        await store.save('abc', context)
+        return await store.load('abc'), await store.load('missing')
+
+    loaded, missing = asyncio.run(round_trip())
+    assert loaded == context
+    assert isinstance(loaded['emotion_state'], chatbot.EmotionState)
+    assert missing is None
+    assert fake_redis.expiries['conv:abc'] == 3600
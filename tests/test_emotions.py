@@ -0,0 +1,172 @@
+import asyncio
+import xml.dom.minidom
+
+import numpy as np
+import pytest
+
+import app as chatbot
+
+
+def analyze(message):
+    return chatbot.analyze_emotional_impact(message, chatbot.EmotionState())
+
+
+def test_validate_impact_requires_a_number_per_emotion():
+    impact = {"happy_sad": 1, "energy_tired": -0.5, "calm_angry": 0, "confident_nervous": 2}
+    assert chatbot.validate_impact(impact) == {k: float(v) for k, v in impact.items()}
+    assert chatbot.validate_impact({**impact, "calm_angry": "angry"}) is None
+    assert chatbot.validate_impact({**impact, "calm_angry": True}) is None
+    assert chatbot.validate_impact({"happy_sad": 1}) is None
+    assert chatbot.validate_impact([1, 2, 3, 4]) is None
+
+
+def test_exact_cache_skips_repeated_messages(fake_client):
+    fake_client.analysis_impacts["Analyze: 'Thanks!'"] = {"happy_sad": 1, "energy_tired": 0, "calm_angry": 0, "confident_nervous": 0}
+
+    first = asyncio.run(analyze("Thanks!"))
+    second = asyncio.run(analyze("  thanks!  "))
+
+    assert first == second == {"happy_sad": 1.0, "energy_tired": 0.0, "calm_angry": 0.0, "confident_nervous": 0.0}
+    assert fake_client.calls['analysis'] == 1
+
+
+def test_semantic_cache_reuses_similar_message_impact(fake_client):
+    fake_client.analysis_impacts["Analyze: 'I love this'"] = {"happy_sad": 2, "energy_tired": 1, "calm_angry": 0, "confident_nervous": 0}
+    fake_client.embedding_vectors = {"I love this": [1.0, 0.0, 0.1], "I really love this": [1.0, 0.0, 0.15], "I hate this": [0.0, 1.0, 0.0]}
+
+    loved = asyncio.run(analyze("I love this"))
+    assert asyncio.run(analyze("I really love this")) == loved
+    assert fake_client.calls['analysis'] == 1
+
+    asyncio.run(analyze("I hate this"))
+    assert fake_client.calls['analysis'] == 2
+
+
+def test_failed_analysis_is_neutral_and_not_cached(fake_client):
+    fake_client.analysis_impacts["Analyze: 'hmm'"] = {"happy_sad": "unsure"}
+
+    assert asyncio.run(analyze("hmm")) == chatbot.NEUTRAL_IMPACT
+    assert chatbot.emotion_cache.get(chatbot.EmotionCache.key("hmm")) is None
+
+
+def test_cache_write_failure_keeps_the_analysis(fake_client):
+    fake_client.analysis_impacts["Analyze: 'yay'"] = {"happy_sad": 2, "energy_tired": 0, "calm_angry": 0, "confident_nervous": 0}
+    chatbot.emotion_cache.conn.close()
+
+    assert asyncio.run(analyze("yay"))["happy_sad"] == 2
+
+
+def test_emotion_cache_evicts_oldest_entries(tmp_path):
+    path = str(tmp_path / "cache.db")
+    cache = chatbot.EmotionCache(path, maxsize=3)
+
+    async def fill():
+        for i in range(5):
+            embedding = np.zeros(8, dtype=np.float32)
+            embedding[i] = 1
+            await cache.put(f"key{i}", {"n": i}, embedding)
+
+    asyncio.run(fill())
+    assert list(cache.impacts) == ["key2", "key3", "key4"]
+    assert cache.embedding_count == 3
+    assert sorted(impact["n"] for impact in cache.embedded_impacts) == [2, 3, 4]
+
+    reloaded = chatbot.EmotionCache(path, maxsize=3)
+    assert list(reloaded.impacts) == ["key2", "key3", "key4"]
+
+
+def test_describe_level_matches_thresholds():
+    def expected(value):
+        if value >= 75: return "very high"
+        if value >= 60: return "high"
+        if value >= 40: return "moderate"
+        if value >= 25: return "low"
+        return "very low"
+
+    for value in np.arange(-5, 105, 0.01):
+        assert chatbot.describe_level(value) == expected(value)
+
+
+def test_generate_emotion_state_moves_halfway_to_clamped_target():
+    state = chatbot.generate_emotion_state(
+        chatbot.EmotionState(happiness=90, energy=50, calmness=50, confidence=10),
+        {"happy_sad": 2, "energy_tired": -1, "calm_angry": 1, "confident_nervous": -2}
+    )
+    assert state == chatbot.EmotionState(happiness=95, energy=37.5, calmness=37.5, confidence=5)
+
+
+def test_generate_emotion_state_does_not_mutate_previous_state():
+    previous = chatbot.EmotionState()
+    chatbot.generate_emotion_state(previous, {"happy_sad": 2})
+    assert previous == chatbot.EmotionState()
+
+
+def test_concurrent_identical_messages_share_one_analysis(fake_client):
+    fake_client.analysis_delay = 0.05
+
+    async def burst():
+        return await asyncio.gather(*(analyze("hi") for _ in range(5)))
+
+    results = asyncio.run(burst())
+    assert all(result == results[0] for result in results)
+    assert fake_client.calls['analysis'] == 1
+    assert fake_client.calls['embedding'] == 1
+    assert chatbot.inflight_analyses == {}
+
+
+def test_cancelled_caller_does_not_cancel_shared_analysis(fake_client):
+    fake_client.analysis_delay = 0.05
+    fake_client.analysis_impacts["Analyze: 'hi'"] = {"happy_sad": 1, "energy_tired": 0, "calm_angry": 0, "confident_nervous": 0}
+
+    async def cancel_first_caller():
+        first = asyncio.ensure_future(analyze("hi"))
+        second = asyncio.ensure_future(analyze("hi"))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(cancel_first_caller())["happy_sad"] == 1
+    assert fake_client.calls['analysis'] == 1
+
+
+def test_svg_face_is_well_formed_and_shows_indicators():
+    neutral = chatbot.generate_svg_face(chatbot.EmotionState())
+    nervous = chatbot.generate_svg_face(chatbot.EmotionState(confidence=10))
+    for svg in (neutral, nervous):
+        xml.dom.minidom.parseString(svg)
+    assert chatbot.BLUSH_SVG not in neutral and chatbot.SWEAT_SVG not in neutral
+    assert chatbot.BLUSH_SVG in nervous and chatbot.SWEAT_SVG in nervous
+
+
+def test_svg_face_memoizes_visually_identical_states():
+    first = chatbot.generate_svg_face(chatbot.EmotionState(happiness=62.51))
+    second = chatbot.generate_svg_face(chatbot.EmotionState(happiness=62.49))
+    assert first is second
+    assert chatbot.render_svg_face.cache_info().hits == 1
+
+
+def test_svg_face_for_near_zero_emotion_is_not_neutral():
+    state = chatbot.EmotionState()
+    for _ in range(10):
+        state = chatbot.generate_emotion_state(state, {"happy_sad": -2})
+
+    assert 0 < state.happiness < 0.05
+    assert chatbot.generate_svg_face(state) == chatbot.generate_svg_face(chatbot.EmotionState(happiness=0))
+    assert chatbot.generate_svg_face(state) != chatbot.generate_svg_face(chatbot.EmotionState())
+
+
+def test_emotion_cache_reloads_the_entries_it_holds(tmp_path):
+    path = str(tmp_path / "cache.db")
+    cache = chatbot.EmotionCache(path, maxsize=3)
+
+    async def fill():
+        for key in ("key0", "key1", "key2", "key2", "key3"):
+            await cache.put(key, {"key": key})
+
+    asyncio.run(fill())
+    # Hits do not refresh entries, so memory and SQLite agree on what is oldest
+    assert cache.get("key1") is not None
+    assert list(cache.impacts) == ["key1", "key2", "key3"]
+    assert list(chatbot.EmotionCache(path, maxsize=3).impacts) == ["key1", "key2", "key3"]